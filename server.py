@@ -4,25 +4,87 @@ FastAPI Server for Code Server
 A simple FastAPI application with basic endpoints.
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Literal
 import uvicorn
 import os
 import subprocess
 import uuid
 import asyncio
 import time
-import json
+import re
+import pybase64
+import shutil
+import zipfile
+import mimetypes
+import hashlib
+import sqlite3
+from contextlib import closing
+from urllib.parse import quote
+from collections import OrderedDict
+import orjson
+import aiofiles
+from zipstream import ZipStream
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
 from playwright.async_api import async_playwright
+import anthropic
 from typing import Dict
 import weakref
 import psutil
 
 # Set DISPLAY for headed browsers (VNC support)
-os.environ['DISPLAY'] = ':1'
+DISPLAY = ":1"
+os.environ['DISPLAY'] = DISPLAY
+
+# Filesystem layout
+WORKDIR = "/root"
+CONTEXT_IN = Path(WORKDIR) / "context-in.txt"
+CONTEXT_OUT = Path(WORKDIR) / "context-out.txt"
+RECORDINGS_BASE = Path("/opt/code-server/recordings")
+SESSIONS_BASE = RECORDINGS_BASE / "sessions"
+ARCHIVED_BASE = RECORDINGS_BASE / "archived"
+VIDEOS_BASE = RECORDINGS_BASE / "videos"
+TRACES_BASE = RECORDINGS_BASE / "traces"
+SCREENSHOTS_BASE = RECORDINGS_BASE / "screenshots"
+
+# Subresources aborted for sessions that only need the DOM, matched on Playwright's resource type
+# so query strings and uncommon extensions (.webp, .svg, app.css?v=3) are caught too
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "stylesheet"})
+
+# Browser pool configuration for the one-shot /api/browser endpoint
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", "50"))
+BROWSER_POOL_PREWARM = [b for b in os.getenv("BROWSER_POOL_PREWARM", "chromium").split(",") if b]
+
+# Hand recording downloads to nginx via X-Accel-Redirect instead of streaming them from Python
+RECORDINGS_VIA_NGINX = os.getenv("RECORDINGS_VIA_NGINX") == "1"
+RECORDINGS_NGINX_PREFIX = os.getenv("RECORDINGS_NGINX_PREFIX", "/internal/recordings")
+
+# Natural-language instructions are converted to actions through the Anthropic API
+NL_MODEL = os.getenv("NL_MODEL", "claude-sonnet-4-20250514")
+NL_TIMEOUT = 30
+
+# Encoding for stored screenshots: "jpeg" or "png". Analysis screenshots are always PNG.
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "jpeg")
+if SCREENSHOT_FORMAT not in ("jpeg", "png"):
+    raise ValueError(f"SCREENSHOT_FORMAT must be 'jpeg' or 'png', got {SCREENSHOT_FORMAT!r}")
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+
+# Concurrent subprocess limits for /api/execute
+CLAUDE_CONCURRENCY = int(os.getenv("CLAUDE_CONCURRENCY", "4"))
+TERM_CONCURRENCY = int(os.getenv("TERM_CONCURRENCY", "8"))
+
+# Idle sessions are closed after their timeout; the oldest idle session is evicted at capacity
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "20"))
+SESSION_SWEEP_INTERVAL = 30
+
+# Session metadata is written in batches: after this many changes or seconds, whichever comes first
+METADATA_FLUSH_THRESHOLD = 16
+METADATA_FLUSH_INTERVAL = 2.0
 
 app = FastAPI(
     title="Code Server API",
@@ -81,46 +143,229 @@ app = FastAPI(
     }
     ```
     """,
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Global session storage
 active_sessions: Dict[str, Dict] = {}
 
+class BrowserPool:
+    """Pool of pre-launched browsers shared by one-shot automation requests"""
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_POOL_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self.playwright = None
+        self._idle: Dict[tuple, asyncio.Queue] = {}
+        self._launched: Dict[tuple, int] = {}
+        self._leases: Dict[object, list] = {}
+        self._replacements = set()
+    
+    async def start(self, playwright, prewarm: List[str] = BROWSER_POOL_PREWARM):
+        """Attach to the global Playwright instance and pre-launch headless browsers"""
+        self.playwright = playwright
+        for browser_type in prewarm:
+            key = (browser_type, True)
+            queue = self._idle.setdefault(key, asyncio.Queue())
+            while self._launched.get(key, 0) < self.size:
+                queue.put_nowait(await self._launch(key))
+    
+    async def _launch(self, key: tuple, reserved: bool = False):
+        """Launch a browser for key; the slot is counted before awaiting so concurrent callers can't overfill the pool"""
+        if not reserved:
+            self._launched[key] = self._launched.get(key, 0) + 1
+        browser_type, headless = key
+        try:
+            browser = await getattr(self.playwright, browser_type).launch(headless=headless)
+        except BaseException:
+            self._launched[key] -= 1
+            raise
+        self._leases[browser] = [key, 0]
+        return browser
+    
+    async def _discard(self, browser):
+        key, _ = self._leases.pop(browser)
+        self._launched[key] -= 1
+        try:
+            await browser.close()
+        except Exception:
+            pass
+    
+    async def acquire(self, browser_type: str = "chromium", headless: bool = True):
+        """Lease a browser, launching one if the pool for this type is not yet full"""
+        key = (browser_type, headless)
+        queue = self._idle.setdefault(key, asyncio.Queue())
+        while True:
+            if queue.empty() and self._launched.get(key, 0) < self.size:
+                return await self._launch(key)
+            browser = await queue.get()
+            if browser.is_connected():
+                return browser
+            await self._discard(browser)
+    
+    async def release(self, browser):
+        """Return a leased browser, recycling it once it reaches max_uses"""
+        key, uses = self._leases[browser]
+        self._leases[browser][1] = uses + 1
+        if uses + 1 < self.max_uses and browser.is_connected():
+            self._idle[key].put_nowait(browser)
+            return
+        
+        # The replacement inherits the recycled browser's slot and launches in the background,
+        # so the releasing request neither waits for it nor fails if it can't start
+        del self._leases[browser]
+        task = asyncio.create_task(self._replace(key, browser))
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+    
+    async def _replace(self, key: tuple, browser):
+        """Close a recycled browser and queue a fresh one in its slot for requests waiting on the pool"""
+        try:
+            await browser.close()
+        except Exception:
+            pass
+        try:
+            self._idle[key].put_nowait(await self._launch(key, reserved=True))
+        except Exception:
+            pass  # _launch released the slot, so the next acquire launches instead
+    
+    async def close(self):
+        """Close every browser owned by the pool"""
+        for task in list(self._replacements):
+            task.cancel()
+        for browser in list(self._leases):
+            await self._discard(browser)
+        self._idle.clear()
+
+browser_pool = BrowserPool()
+
+@app.on_event("startup")
+async def startup():
+    app.state.playwright = await async_playwright().start()
+    app.state.browsers = {}
+    app.state.browser_launch_lock = asyncio.Lock()
+    app.state.metadata_flusher = asyncio.create_task(session_manager.periodic_flush())
+    app.state.session_sweeper = asyncio.create_task(session_manager.sweep_idle_sessions())
+    await browser_pool.start(app.state.playwright)
+
+@app.on_event("shutdown")
+async def shutdown():
+    for session_id in list(session_manager.sessions):
+        await session_manager.close_session(session_id)
+    app.state.metadata_flusher.cancel()
+    app.state.session_sweeper.cancel()
+    for browser in app.state.browsers.values():
+        await browser.close()
+    await browser_pool.close()
+    await app.state.playwright.stop()
+
+async def get_shared_browser(browser_type: str = "chromium", headless: bool = True):
+    """Return the process-wide browser for these launch options, launching it on first use"""
+    key = (browser_type, headless)
+    browser = app.state.browsers.get(key)
+    if browser is None or not browser.is_connected():
+        # Serialize launches so concurrent session creates don't each start a browser
+        async with app.state.browser_launch_lock:
+            browser = app.state.browsers.get(key)
+            if browser is None or not browser.is_connected():
+                browser = await getattr(app.state.playwright, browser_type).launch(headless=headless)
+                app.state.browsers[key] = browser
+    return browser
+
 class SessionManager:
     def __init__(self):
         self.sessions = {}
-        self.recordings_base = "/opt/code-server/recordings"
+        self.recordings_base = RECORDINGS_BASE
+        self._dirty = set()
+        self._pending: Dict[str, int] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._flush_tasks = set()
+        self._flush_lock = asyncio.Lock()
+        self._listing_cache: Optional[list] = None
+        self._listing_dirty = True
+    
+    def _session_paths(self, session_id: str):
+        """Build the session's paths once so per-action code only joins a filename"""
+        root = SESSIONS_BASE / f"session_{session_id}"
+        return {
+            "root": root,
+            "screenshots": root / "screenshots",
+            "videos": root / "videos",
+            "traces": root / "traces",
+            "metadata": root / "metadata.json"
+        }
     
-    def _create_session_directory(self, session_id: str):
+    async def _create_session_directory(self, session_id: str):
         """Create session-specific directory structure"""
-        session_dir = f"{self.recordings_base}/sessions/session_{session_id}"
-        os.makedirs(f"{session_dir}/screenshots", exist_ok=True)
-        os.makedirs(f"{session_dir}/videos", exist_ok=True)
-        os.makedirs(f"{session_dir}/traces", exist_ok=True)
-        return session_dir
-    
-    def _save_session_metadata(self, session_id: str, metadata: dict):
-        """Save session metadata to JSON file"""
-        session_dir = f"{self.recordings_base}/sessions/session_{session_id}"
-        metadata_path = f"{session_dir}/metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-    
-    async def create_session(self, session_id: str, browser_type: str = "chromium", headless: bool = True, viewport_width: int = 1280, viewport_height: int = 720, record_video: bool = False):
+        paths = self._session_paths(session_id)
+        
+        def _mk():
+            # Walk the parents once for the session root; each subdirectory is then a single mkdir
+            paths["root"].mkdir(parents=True, exist_ok=True)
+            for sub in ("screenshots", "videos", "traces"):
+                paths[sub].mkdir(exist_ok=True)
+        
+        await asyncio.to_thread(_mk)
+        return paths
+    
+    def _save_session_metadata(self, metadata_path: Path, data: bytes):
+        """Save serialized session metadata to JSON file"""
+        with open(metadata_path, 'wb') as f:
+            f.write(data)
+    
+    async def flush_metadata(self, session_id: str, session: Optional[dict] = None):
+        """Write session metadata to disk without blocking the event loop
+        
+        Pass session to flush one that has already been removed from self.sessions.
+        """
+        if session is None:
+            session = self.sessions.get(session_id)
+        if not session:
+            return
+        
+        self._dirty.discard(session_id)
+        self._pending[session_id] = 0
+        self._last_flush[session_id] = time.time()
+        
+        # Serialize here so the snapshot can't change underneath the writer thread;
+        # the lock keeps writes for the same file in the order they were serialized
+        data = orjson.dumps(session["metadata"], option=orjson.OPT_INDENT_2)
+        async with self._flush_lock:
+            await asyncio.to_thread(self._save_session_metadata, session["paths"]["metadata"], data)
+    
+    def _mark_dirty(self, session_id: str):
+        """Record a metadata change, flushing once enough changes or time have accumulated"""
+        self._listing_dirty = True
+        self._dirty.add(session_id)
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        
+        if (self._pending[session_id] >= METADATA_FLUSH_THRESHOLD
+                or time.time() - self._last_flush.get(session_id, 0) > METADATA_FLUSH_INTERVAL):
+            task = asyncio.create_task(self.flush_metadata(session_id))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+    
+    async def periodic_flush(self):
+        """Background task that writes out metadata still dirty after the flush interval"""
+        while True:
+            await asyncio.sleep(METADATA_FLUSH_INTERVAL)
+            for session_id in list(self._dirty):
+                try:
+                    await self.flush_metadata(session_id)
+                except Exception:
+                    continue  # Retry on the next tick
+    
+    async def create_session(self, session_id: str, browser_type: str = "chromium", headless: bool = True, viewport_width: int = 1280, viewport_height: int = 720, record_video: bool = False, timeout: int = 3600, block_resources: bool = False):
         async def _create():
-            playwright = await async_playwright().__aenter__()
-            browser_launcher = getattr(playwright, browser_type)
-            browser = await browser_launcher.launch(headless=headless)
+            # Sessions are contexts on a shared browser, so no driver or browser is spawned here
+            browser = await get_shared_browser(browser_type, headless)
             
             # Configure context with optional video recording
             context_options = {"viewport": {"width": viewport_width, "height": viewport_height}}
             
             if record_video:
-                session_dir = f"{self.recordings_base}/sessions/session_{session_id}"
-                video_dir = f"{session_dir}/videos"
                 context_options.update({
-                    "record_video_dir": video_dir,
+                    "record_video_dir": str(paths["videos"]),
                     "record_video_size": {"width": viewport_width, "height": viewport_height}
                 })
             
@@ -128,24 +373,29 @@ class SessionManager:
             page = await context.new_page()
             
             return {
-                "playwright": playwright,
-                "browser": browser, 
                 "context": context,
                 "page": page,
-                "screenshots": [],
-                "videos": [],
-                "traces": [],
+                "parallel_pages": [],
+                "counters": {"screenshots": 0, "videos": 0, "traces": 0},
                 "created_at": time.time(),
                 "action_count": 0,
                 "last_activity": time.time(),
-                "recording_video": record_video
+                "timeout": timeout if timeout is not None else 3600,
+                "recording_video": record_video,
+                "resource_route": None
             }
         
+        # Make room by closing the least recently used session
+        while len(self.sessions) >= MAX_SESSIONS:
+            lru_session_id = min(self.sessions, key=lambda sid: self.sessions[sid]["last_activity"])
+            await self.close_session(lru_session_id)
+        
         # Create session directory structure
-        session_dir = self._create_session_directory(session_id)
+        paths = await self._create_session_directory(session_id)
         
         # Create session data
         session_data = await _create()
+        session_data["paths"] = paths
         
         # Create initial metadata
         metadata = {
@@ -155,23 +405,93 @@ class SessionManager:
             "headless": headless,
             "viewport": {"width": viewport_width, "height": viewport_height},
             "record_video": record_video,
+            "block_resources": block_resources,
             "status": "active",
             "total_actions": 0,
             "screenshots": [],
             "videos": [],
             "traces": [],
             "last_activity": datetime.fromtimestamp(session_data["last_activity"]).isoformat(),
-            "session_dir": session_dir
+            "session_dir": str(paths["root"])
         }
         
         session_data["metadata"] = metadata
-        self._save_session_metadata(session_id, metadata)
-        
         self.sessions[session_id] = session_data
+        self._listing_dirty = True
+        if block_resources:
+            await self.set_resource_blocking(session_id, True)
+        await self.flush_metadata(session_id)
+        
         return session_data
     
+    async def set_resource_blocking(self, session_id: str, enabled: bool):
+        """Install or remove the context route that aborts images, fonts, and stylesheets"""
+        session = self.sessions[session_id]
+        if session["metadata"]["block_resources"] != enabled:
+            session["metadata"]["block_resources"] = enabled
+            self._mark_dirty(session_id)
+        handler = session["resource_route"]
+        if enabled and handler is None:
+            async def handler(route):
+                if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+                    await route.abort()
+                else:
+                    await route.continue_()
+            # Claim the slot before awaiting so concurrent callers don't install a second route
+            session["resource_route"] = handler
+            await session["context"].route("**/*", handler)
+        elif not enabled and handler is not None:
+            session["resource_route"] = None
+            await session["context"].unroute("**/*", handler)
+    
     async def get_session(self, session_id: str):
-        return self.sessions.get(session_id)
+        session = self.sessions.get(session_id)
+        if session:
+            # Any API use of a session keeps it from being swept as idle
+            session["last_activity"] = time.time()
+        return session
+    
+    async def sweep_idle_sessions(self):
+        """Background task that closes sessions idle for longer than their timeout"""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            try:
+                now = time.time()
+                stale = [sid for sid, s in self.sessions.items() if now - s["last_activity"] > s["timeout"]]
+            except Exception:
+                continue  # A bad session entry must not stop sweeping for everyone
+            for session_id in stale:
+                try:
+                    await self.close_session(session_id)
+                except Exception:
+                    continue  # Retry on the next sweep
+    
+    def list_sessions(self):
+        """Return session summaries, rebuilding them only after a session or its metadata changed"""
+        if self._listing_dirty or self._listing_cache is None:
+            self._listing_cache = []
+            for session_id, session in self.sessions.items():
+                metadata = session["metadata"]
+                self._listing_cache.append({
+                    "session_id": session_id,
+                    "created_at": metadata["created_at"],
+                    "browser_type": metadata["browser_type"],
+                    "headless": metadata["headless"],
+                    "record_video": metadata.get("record_video", False),
+                    "status": metadata["status"],
+                    "total_actions": metadata["total_actions"],
+                    "last_activity": metadata["last_activity"],
+                    "viewport": metadata["viewport"]
+                })
+            self._listing_dirty = False
+        return self._listing_cache
+    
+    async def get_parallel_pages(self, session_id: str, count: int):
+        """Return count pages for a parallel group: the session page plus reusable extra tabs"""
+        session = self.sessions[session_id]
+        while len(session["parallel_pages"]) < count - 1:
+            session["parallel_pages"].append(await session["context"].new_page())
+        return [session["page"]] + session["parallel_pages"][:count - 1]
     
     def _get_next_sequence_number(self, session_id: str, asset_type: str):
         """Get next sequential number for asset naming"""
@@ -179,8 +499,8 @@ class SessionManager:
         if not session:
             return 1
         
-        assets = session["metadata"][asset_type]
-        return len(assets) + 1
+        session["counters"][asset_type] += 1
+        return session["counters"][asset_type]
     
     def add_screenshot(self, session_id: str, action: str, description: str = "", url: str = ""):
         """Add screenshot to session with sequential naming"""
@@ -188,10 +508,11 @@ class SessionManager:
         if not session:
             return None
         
+        now = time.time()
+        now_iso = datetime.fromtimestamp(now).isoformat()
         seq_num = self._get_next_sequence_number(session_id, "screenshots")
-        filename = f"{seq_num:03d}_{action}_{description}.png".replace(" ", "_")
-        session_dir = session["metadata"]["session_dir"]
-        filepath = f"{session_dir}/screenshots/{filename}"
+        filename = f"{seq_num:03d}_{action}_{description}.{SCREENSHOT_EXTENSION}".replace(" ", "_")
+        filepath = str(session["paths"]["screenshots"] / filename)
         
         # Update session metadata
         screenshot_entry = {
@@ -201,42 +522,59 @@ class SessionManager:
             "description": description,
             "url": url,
             "sequence": seq_num,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         }
         
-        session["screenshots"].append(filepath)
         session["metadata"]["screenshots"].append(screenshot_entry)
         session["metadata"]["total_actions"] += 1
-        session["metadata"]["last_activity"] = datetime.now().isoformat()
-        session["last_activity"] = time.time()
+        session["metadata"]["last_activity"] = now_iso
+        session["last_activity"] = now
         
-        self._save_session_metadata(session_id, session["metadata"])
+        self._mark_dirty(session_id)
         return filepath
     
+    def discard_screenshot(self, session_id: str, filepath: str):
+        """Drop a screenshot entry whose capture failed so assets and exports don't list a missing file"""
+        session = self.sessions.get(session_id)
+        if not session:
+            return
+        
+        screenshots = session["metadata"]["screenshots"]
+        for i in range(len(screenshots) - 1, -1, -1):
+            if screenshots[i]["filepath"] == filepath:
+                del screenshots[i]
+                session["metadata"]["total_actions"] -= 1
+                self._mark_dirty(session_id)
+                return
+    
     def add_video(self, session_id: str, description: str = "session_recording"):
         """Add video to session with sequential naming"""
         session = self.sessions.get(session_id)
         if not session:
             return None
         
-        seq_num = self._get_next_sequence_number(session_id, "videos")
+        filepath = self._add_video_entry(session, description)
+        self._mark_dirty(session_id)
+        return filepath
+    
+    def _add_video_entry(self, session: dict, description: str) -> str:
+        """Record a video in the session's metadata and return the path it should be saved to"""
+        now_iso = datetime.now().isoformat()
+        session["counters"]["videos"] += 1
+        seq_num = session["counters"]["videos"]
         filename = f"{seq_num:03d}_{description}.webm".replace(" ", "_")
-        session_dir = session["metadata"]["session_dir"]
-        filepath = f"{session_dir}/videos/{filename}"
+        filepath = str(session["paths"]["videos"] / filename)
         
         video_entry = {
             "filename": filename,
             "filepath": filepath,
             "description": description,
             "sequence": seq_num,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         }
         
-        session["videos"].append(filepath)
         session["metadata"]["videos"].append(video_entry)
-        session["metadata"]["last_activity"] = datetime.now().isoformat()
-        
-        self._save_session_metadata(session_id, session["metadata"])
+        session["metadata"]["last_activity"] = now_iso
         return filepath
     
     def add_trace(self, session_id: str, description: str = "interaction_trace"):
@@ -245,72 +583,154 @@ class SessionManager:
         if not session:
             return None
         
+        now_iso = datetime.now().isoformat()
         seq_num = self._get_next_sequence_number(session_id, "traces")
         filename = f"{seq_num:03d}_{description}.zip".replace(" ", "_")
-        session_dir = session["metadata"]["session_dir"]
-        filepath = f"{session_dir}/traces/{filename}"
+        filepath = str(session["paths"]["traces"] / filename)
         
         trace_entry = {
             "filename": filename,
             "filepath": filepath,
             "description": description,
             "sequence": seq_num,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso
         }
         
-        session["traces"].append(filepath)
         session["metadata"]["traces"].append(trace_entry)
-        session["metadata"]["last_activity"] = datetime.now().isoformat()
+        session["metadata"]["last_activity"] = now_iso
         
-        self._save_session_metadata(session_id, session["metadata"])
+        self._mark_dirty(session_id)
         return filepath
     
     async def close_session(self, session_id: str):
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            
-            # If video recording was enabled, add the video file to session metadata
+        # Claim the session before any await so concurrent closers (idle sweep, eviction, API calls)
+        # can't tear down the same session twice
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        self._listing_dirty = True
+        self._dirty.discard(session_id)
+        self._pending.pop(session_id, None)
+        self._last_flush.pop(session_id, None)
+        
+        try:
+            # Playwright finishes writing each page's video when the context closes
+            await session["context"].close()
+        finally:
+            # If video recording was enabled, add every page's video to session metadata
             if session["metadata"].get("record_video", False):
-                # Playwright automatically saves videos when the context closes
-                # Video is saved to the record_video_dir path specified during context creation
-                video_path = session["metadata"]["session_dir"] + "/videos/"
-                if os.path.exists(video_path):
-                    # Find the generated video file (usually named with a UUID)
-                    video_files = [f for f in os.listdir(video_path) if f.endswith('.webm')]
-                    if video_files:
-                        # Rename to our sequential naming convention
-                        original_video = os.path.join(video_path, video_files[0])
-                        new_video_path = self.add_video(session_id, "session_recording")
-                        if new_video_path and os.path.exists(original_video):
-                            os.rename(original_video, new_video_path)
+                pages = [(session["page"], "session_recording")]
+                pages += [(tab, f"parallel_tab_{n}") for n, tab in enumerate(session["parallel_pages"], 1)]
+                for page, description in pages:
+                    await self._save_page_video(session, page, description)
             
             # Update metadata status to completed
             session["metadata"]["status"] = "completed"
             session["metadata"]["last_activity"] = datetime.now().isoformat()
-            self._save_session_metadata(session_id, session["metadata"])
-            
-            await session["context"].close()
-            await session["browser"].close()
-            await session["playwright"].__aexit__(None, None, None)
-            del self.sessions[session_id]
+            await self.flush_metadata(session_id, session)
+    
+    async def _save_page_video(self, session: dict, page, description: str):
+        """Rename a page's recording to the sequential naming convention and record it in metadata"""
+        if page.video is None:
+            return
+        try:
+            original_video = await page.video.path()
+        except Exception:
+            return
+        if not await asyncio.to_thread(os.path.exists, original_video):
+            return
+        new_video_path = self._add_video_entry(session, description)
+        try:
+            await asyncio.to_thread(os.rename, original_video, new_video_path)
+        except OSError:
+            session["metadata"]["videos"].pop()  # Don't list a recording that isn't there
 
 session_manager = SessionManager()
 
-class ContextInput(BaseModel):
+def screenshot_options(screenshot_format: str, quality: int):
+    """Return page.screenshot() options and file extension for a screenshot format"""
+    if screenshot_format == "png":
+        return {"type": "png", "full_page": False}, "png"
+    if screenshot_format == "jpeg":
+        return {"type": "jpeg", "quality": quality, "full_page": False}, "jpg"
+    raise ValueError(f"Unsupported screenshot format: {screenshot_format!r}")
+
+SCREENSHOT_OPTIONS, SCREENSHOT_EXTENSION = screenshot_options(SCREENSHOT_FORMAT, SCREENSHOT_QUALITY)
+
+# Response timestamps are formatted at most once per interval and shared between requests
+TIMESTAMP_GRANULARITY = 0.1
+_timestamp_cache = [0.0, ""]
+
+def now_iso() -> str:
+    """Current local time in ISO format, accurate to TIMESTAMP_GRANULARITY seconds"""
+    t = time.time()
+    if t - _timestamp_cache[0] > TIMESTAMP_GRANULARITY:
+        _timestamp_cache[0] = t
+        _timestamp_cache[1] = datetime.fromtimestamp(t).isoformat()
+    return _timestamp_cache[1]
+
+async def write_file(path, data: bytes):
+    """Write bytes to path with aiofiles"""
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(data)
+
+async def capture_screenshot(page, path, **options) -> bytes:
+    """Capture a screenshot into memory and write it with aiofiles, returning the image bytes"""
+    data = await page.screenshot(**options)
+    await write_file(path, data)
+    return data
+
+async def capture_error_screenshot(page, path) -> Optional[str]:
+    """Best-effort screenshot for an error response, returning None if the page can't be captured within a few seconds"""
+    try:
+        await asyncio.wait_for(page.screenshot(path=path, timeout=2000, **SCREENSHOT_OPTIONS), timeout=2.5)
+        return path
+    except Exception:
+        return None
+
+async def capture_screenshot_deferred(page, path, pending_writes: List[asyncio.Task], **options) -> bytes:
+    """Capture a screenshot now and queue its file write on pending_writes, returning the image bytes"""
+    data = await page.screenshot(**options)
+    pending_writes.append(asyncio.create_task(write_file(path, data)))
+    return data
+
+@dataclass(slots=True)
+class ActionResult:
+    """Outcome of one sequence or natural-language action; unset fields are left out of responses"""
+    action: Optional[str]
+    step: Optional[int]
+    status: Optional[str] = None
+    selector: Optional[str] = None
+    url: Optional[str] = None
+    text: Optional[str] = None
+    timeout: Optional[int] = None
+    screenshot_path: Optional[str] = None
+    message: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        return {name: value for name in self.__slots__ if (value := getattr(self, name)) is not None}
+
+class RequestModel(BaseModel):
+    """Base for request bodies: immutable once validated, unknown fields dropped"""
+    model_config = ConfigDict(extra='ignore', frozen=True, validate_assignment=False)
+
+class ContextInput(RequestModel):
     content: str
 
-class CommandInput(BaseModel):
+class CommandInput(RequestModel):
     command: Optional[str] = None
     term: Optional[str] = None
 
-class BrowserAction(BaseModel):
+class BrowserAction(RequestModel):
     action: str  # "goto", "click", "type", "screenshot", "wait"
     selector: Optional[str] = None
     text: Optional[str] = None
     url: Optional[str] = None
     timeout: Optional[int] = 5000
+    screenshot_format: Literal["jpeg", "png"] = SCREENSHOT_FORMAT  # png is lossless, for pixel diffs
+    screenshot_quality: Optional[int] = SCREENSHOT_QUALITY
 
-class BrowserSessionInput(BaseModel):
+class BrowserSessionInput(RequestModel):
     browser: Optional[str] = "chromium"  # chromium, firefox, webkit
     headless: Optional[bool] = True
     record_video: Optional[bool] = False
@@ -319,15 +739,16 @@ class BrowserSessionInput(BaseModel):
     viewport_width: Optional[int] = 1280
     viewport_height: Optional[int] = 720
 
-class SessionCreateInput(BaseModel):
+class SessionCreateInput(RequestModel):
     browser: Optional[str] = "chromium"
     headless: Optional[bool] = True
     viewport_width: Optional[int] = 1280
     viewport_height: Optional[int] = 720
-    timeout: Optional[int] = 3600
+    timeout: int = 3600  # idle seconds before the session is closed
     record_video: Optional[bool] = False
+    block_resources: Optional[bool] = False  # abort image, font, and stylesheet requests
 
-class SequenceAction(BaseModel):
+class SequenceAction(RequestModel):
     action: str
     url: Optional[str] = None
     selector: Optional[str] = None
@@ -335,13 +756,19 @@ class SequenceAction(BaseModel):
     timeout: Optional[int] = 5000
     screenshot_after: Optional[bool] = False
     wait_for_analysis: Optional[bool] = False
+    screenshot_format: Literal["jpeg", "png"] = SCREENSHOT_FORMAT  # png is lossless, for pixel diffs
+    screenshot_quality: Optional[int] = SCREENSHOT_QUALITY
+    parallel_group: Optional[int] = None  # consecutive actions sharing a group run concurrently, one tab each
+    wait_until: Optional[str] = None  # goto load state; defaults to "domcontentloaded"
+    block_resources: Optional[bool] = None  # toggle the session's image/font/stylesheet blocking from here on
 
-class SequenceInput(BaseModel):
+class SequenceInput(RequestModel):
     actions: List[SequenceAction]
 
-class NaturalLanguageInput(BaseModel):
+class NaturalLanguageInput(RequestModel):
     instruction: str
     include_screenshot: Optional[bool] = True
+    no_cache: Optional[bool] = False  # regenerate actions instead of replaying a cached conversion
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -363,7 +790,7 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "version": "1.0.0"
     }
 
@@ -374,23 +801,23 @@ async def get_info():
         "server": "Code Server API",
         "version": "1.0.0",
         "python_version": os.sys.version,
-        "uptime": datetime.now().isoformat()
+        "uptime": now_iso()
     }
 
 @app.get("/api/context")
 async def get_context():
     """Read contents of context-out.txt from root directory"""
-    context_file_path = "/root/context-out.txt"
+    context_file_path = CONTEXT_OUT
     
     try:
-        with open(context_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+        async with aiofiles.open(context_file_path, 'r', encoding='utf-8') as file:
+            content = await file.read()
         
         return {
             "status": "success",
-            "file_path": context_file_path,
+            "file_path": str(context_file_path),
             "content": content,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="context-out.txt file not found")
@@ -400,22 +827,71 @@ async def get_context():
 @app.post("/api/context-in")
 async def write_context_in(input_data: ContextInput):
     """Write content to context-in.txt in root directory"""
-    context_file_path = "/root/context-in.txt"
+    context_file_path = CONTEXT_IN
     
     try:
-        with open(context_file_path, 'w', encoding='utf-8') as file:
-            file.write(input_data.content)
+        async with aiofiles.open(context_file_path, 'w', encoding='utf-8') as file:
+            await file.write(input_data.content)
         
         return {
             "status": "success",
             "message": "Content written to context-in.txt",
-            "file_path": context_file_path,
+            "file_path": str(context_file_path),
             "content_length": len(input_data.content),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error writing file: {str(e)}")
 
+class ExecutionLimiter:
+    """Semaphore that also tracks how many commands are running and queued"""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.running -= 1
+        self._semaphore.release()
+    
+    def stats(self):
+        return {"limit": self.limit, "running": self.running, "waiting": self.waiting}
+
+CLAUDE_LIMITER = ExecutionLimiter(CLAUDE_CONCURRENCY)
+TERM_LIMITER = ExecutionLimiter(TERM_CONCURRENCY)
+
+async def run_command(command: List[str], timeout: int, cwd: str = WORKDIR) -> subprocess.CompletedProcess:
+    """Run a command without blocking the event loop, killing it if it exceeds timeout"""
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    
+    return subprocess.CompletedProcess(
+        command,
+        proc.returncode,
+        stdout.decode('utf-8', errors='replace'),
+        stderr.decode('utf-8', errors='replace')
+    )
+
 @app.post("/api/execute")
 async def execute_command(command_data: CommandInput):
     """Execute either claude -p [command] or direct terminal command"""
@@ -443,30 +919,24 @@ async def execute_command(command_data: CommandInput):
 
             # Get system resource info before execution
             memory_before = psutil.virtual_memory().percent
-            cpu_before = psutil.cpu_percent(interval=0.1)
+            cpu_before = await asyncio.to_thread(psutil.cpu_percent, interval=0.1)
 
-            result = subprocess.run(
-                claude_command,
-                capture_output=True,
-                text=True,
-                timeout=300,  # 300 second timeout (5 minutes)
-                cwd="/root"  # Execute from root directory
-            )
+            async with CLAUDE_LIMITER:
+                result = await run_command(claude_command, timeout=300)  # 300 second timeout (5 minutes)
 
             # Get system resource info after execution
             memory_after = psutil.virtual_memory().percent
-            cpu_after = psutil.cpu_percent(interval=0.1)
+            cpu_after = await asyncio.to_thread(psutil.cpu_percent, interval=0.1)
             
             # Log Claude's response to context-out.txt
             try:
-                context_out_path = "/root/context-out.txt"
-                with open(context_out_path, 'w', encoding='utf-8') as f:
-                    f.write(f"Claude Response - {datetime.now().isoformat()}\n")
-                    f.write(f"Command: {command_data.command}\n")
-                    f.write(f"Return Code: {result.returncode}\n")
-                    f.write(f"Output:\n{result.stdout}\n")
+                async with aiofiles.open(CONTEXT_OUT, 'w', encoding='utf-8') as f:
+                    await f.write(f"Claude Response - {datetime.now().isoformat()}\n")
+                    await f.write(f"Command: {command_data.command}\n")
+                    await f.write(f"Return Code: {result.returncode}\n")
+                    await f.write(f"Output:\n{result.stdout}\n")
                     if result.stderr:
-                        f.write(f"Errors:\n{result.stderr}\n")
+                        await f.write(f"Errors:\n{result.stderr}\n")
             except Exception as log_error:
                 # Don't fail the main request if logging fails
                 pass
@@ -497,20 +967,14 @@ async def execute_command(command_data: CommandInput):
                     "cpu_before": f"{cpu_before:.1f}%",
                     "cpu_after": f"{cpu_after:.1f}%"
                 },
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now_iso()
             }
         
         elif command_data.term is not None:
-            # Execute direct terminal command
+            # Execute direct terminal command (exec with a pre-split list, never through a shell)
             terminal_command = command_data.term.split()
-            result = subprocess.run(
-                terminal_command,
-                capture_output=True,
-                text=True,
-                timeout=300,  # 300 second timeout (5 minutes)
-                cwd="/root",  # Execute from root directory
-                shell=False  # Use shell=False for security
-            )
+            async with TERM_LIMITER:
+                result = await run_command(terminal_command, timeout=300)  # 300 second timeout (5 minutes)
             
             return {
                 "status": "success",
@@ -518,21 +982,30 @@ async def execute_command(command_data: CommandInput):
                 "return_code": result.returncode,
                 "stdout": result.stdout,
                 "stderr": result.stderr,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now_iso()
             }
             
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Command execution timed out (5 minutes)")
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=f"Command not found: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error executing command: {str(e)}")
 
+@app.get("/api/execute/stats")
+async def execute_stats():
+    """Report running and queued /api/execute commands per limiter"""
+    return {
+        "status": "success",
+        "claude": CLAUDE_LIMITER.stats(),
+        "term": TERM_LIMITER.stats(),
+        "timestamp": now_iso()
+    }
+
 @app.post("/api/browser")
 async def browser_automation(session_data: BrowserSessionInput):
     """Execute browser automation with optional recording"""
     session_id = str(uuid.uuid4())[:8]
-    recordings_dir = "/opt/code-server/recordings"
     
     # Prepare recording paths
     video_path = None
@@ -540,31 +1013,30 @@ async def browser_automation(session_data: BrowserSessionInput):
     screenshots = []
     
     if session_data.record_video:
-        video_path = f"{recordings_dir}/videos"
+        video_path = str(VIDEOS_BASE)
     
     if session_data.enable_tracing:
-        trace_path = f"{recordings_dir}/traces/trace_{session_id}.zip"
+        trace_path = str(TRACES_BASE / f"trace_{session_id}.zip")
     
     try:
-        async with async_playwright() as p:
-            # Launch browser
-            browser_type = getattr(p, session_data.browser)
-            
-            context_options = {
-                "viewport": {
-                    "width": session_data.viewport_width,
-                    "height": session_data.viewport_height
-                }
+        context_options = {
+            "viewport": {
+                "width": session_data.viewport_width,
+                "height": session_data.viewport_height
             }
-            
-            if session_data.record_video:
-                context_options["record_video_dir"] = video_path
-                context_options["record_video_size"] = {
-                    "width": session_data.viewport_width,
-                    "height": session_data.viewport_height
-                }
-            
-            browser = await browser_type.launch(headless=session_data.headless)
+        }
+        
+        if session_data.record_video:
+            context_options["record_video_dir"] = video_path
+            context_options["record_video_size"] = {
+                "width": session_data.viewport_width,
+                "height": session_data.viewport_height
+            }
+        
+        # Lease a pre-warmed browser; each request still gets its own isolated context
+        browser = await browser_pool.acquire(session_data.browser, session_data.headless)
+        context = None
+        try:
             context = await browser.new_context(**context_options)
             
             # Start tracing if enabled
@@ -590,8 +1062,9 @@ async def browser_automation(session_data: BrowserSessionInput):
                         action_results.append({"action": "type", "selector": action.selector, "status": "success"})
                     
                     elif action.action == "screenshot":
-                        screenshot_path = f"{recordings_dir}/screenshots/screenshot_{session_id}_{i}.png"
-                        await page.screenshot(path=screenshot_path)
+                        options, extension = screenshot_options(action.screenshot_format, action.screenshot_quality)
+                        screenshot_path = str(SCREENSHOTS_BASE / f"screenshot_{session_id}_{i}.{extension}")
+                        await page.screenshot(path=screenshot_path, **options)
                         screenshots.append(screenshot_path)
                         action_results.append({"action": "screenshot", "path": screenshot_path, "status": "success"})
                     
@@ -613,70 +1086,111 @@ async def browser_automation(session_data: BrowserSessionInput):
             video_file = None
             if session_data.record_video:
                 await context.close()
-                # Video file will be in the video directory
-                import glob
-                video_files = glob.glob(f"{video_path}/*.webm")
-                if video_files:
-                    # Rename to session-specific name
-                    video_file = f"{recordings_dir}/videos/session_{session_id}.webm"
-                    os.rename(video_files[0], video_file)
-            
-            await browser.close()
-            
-            return {
-                "status": "success",
-                "session_id": session_id,
-                "actions_executed": len(action_results),
-                "action_results": action_results,
-                "recordings": {
-                    "video": video_file if video_file else None,
-                    "trace": trace_path if session_data.enable_tracing else None,
-                    "screenshots": screenshots
-                },
-                "timestamp": datetime.now().isoformat()
-            }
+                context = None
+                # Pooled browsers serve concurrent requests, so ask the page for its own video
+                # rather than picking the first .webm in the shared directory
+                if page.video:
+                    video_file = str(VIDEOS_BASE / f"session_{session_id}.webm")
+                    os.rename(await page.video.path(), video_file)
+        finally:
+            if context is not None:
+                await context.close()
+            await browser_pool.release(browser)
+        
+        return {
+            "status": "success",
+            "session_id": session_id,
+            "actions_executed": len(action_results),
+            "action_results": action_results,
+            "recordings": {
+                "video": video_file if video_file else None,
+                "trace": trace_path if session_data.enable_tracing else None,
+                "screenshots": screenshots
+            },
+            "timestamp": now_iso()
+        }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Browser automation error: {str(e)}")
 
+# Burst polling of /api/recordings is served from one directory scan per TTL window
+RECORDINGS_LISTING_TTL = 2.0
+_recordings_listing_cache = {"expires_at": 0.0, "recordings": None}
+
+def _scan_recordings() -> dict:
+    """List recording basenames by extension without stat-ing each file"""
+    def _names(subdir: str, suffix) -> List[str]:
+        try:
+            with os.scandir(RECORDINGS_BASE / subdir) as it:
+                return [e.name for e in it if e.name.endswith(suffix)]
+        except FileNotFoundError:
+            return []
+    
+    return {
+        "videos": _names("videos", ".webm"),
+        "traces": _names("traces", ".zip"),
+        "screenshots": _names("screenshots", (".png", ".jpg"))
+    }
+
 @app.get("/api/recordings")
 async def list_recordings():
     """List all available recordings"""
-    recordings_dir = "/opt/code-server/recordings"
-    
     try:
-        import glob
-        
-        videos = glob.glob(f"{recordings_dir}/videos/*.webm")
-        traces = glob.glob(f"{recordings_dir}/traces/*.zip")
-        screenshots = glob.glob(f"{recordings_dir}/screenshots/*.png")
+        now = time.time()
+        if now >= _recordings_listing_cache["expires_at"]:
+            _recordings_listing_cache["recordings"] = await asyncio.to_thread(_scan_recordings)
+            _recordings_listing_cache["expires_at"] = now + RECORDINGS_LISTING_TTL
+        recordings = _recordings_listing_cache["recordings"]
         
         return {
             "status": "success",
-            "recordings": {
-                "videos": [os.path.basename(v) for v in videos],
-                "traces": [os.path.basename(t) for t in traces],
-                "screenshots": [os.path.basename(s) for s in screenshots]
-            },
-            "total_files": len(videos) + len(traces) + len(screenshots),
-            "timestamp": datetime.now().isoformat()
+            "recordings": recordings,
+            "total_files": sum(len(names) for names in recordings.values()),
+            "timestamp": now_iso()
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing recordings: {str(e)}")
 
+RECORDING_MEDIA_TYPES = {
+    "videos": "video/webm",
+    "traces": "application/zip",
+    "screenshots": "image/png"
+}
+
+def _attachment_disposition(filename: str) -> str:
+    """Content-Disposition for a download, RFC 5987-encoded for non-ASCII names as FileResponse does"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
 @app.get("/api/recordings/{recording_type}/{filename}")
 async def download_recording(recording_type: str, filename: str):
     """Download a specific recording file"""
-    if recording_type not in ["videos", "traces", "screenshots"]:
+    if recording_type not in RECORDING_MEDIA_TYPES:
         raise HTTPException(status_code=400, detail="Invalid recording type. Use: videos, traces, or screenshots")
     
-    file_path = f"/opt/code-server/recordings/{recording_type}/{filename}"
+    file_path = RECORDINGS_BASE / recording_type / filename
+    media_type = mimetypes.guess_type(filename)[0] or RECORDING_MEDIA_TYPES[recording_type]
     
-    if not os.path.exists(file_path):
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Recording file not found")
     
-    return FileResponse(file_path, filename=filename)
+    if RECORDINGS_VIA_NGINX:
+        return Response(
+            media_type=media_type,
+            headers={
+                # Re-encode the decoded name so ?, #, % or spaces can't change the URI nginx resolves
+                "X-Accel-Redirect": f"{RECORDINGS_NGINX_PREFIX}/{recording_type}/{quote(filename)}",
+                "Content-Disposition": _attachment_disposition(filename)
+            }
+        )
+    
+    # Reusing the stat result saves FileResponse a second stat and sets Content-Length up front
+    return FileResponse(file_path, filename=filename, media_type=media_type, stat_result=stat_result)
 
 @app.post("/api/sessions/create")
 async def create_session(session_input: SessionCreateInput):
@@ -708,14 +1222,16 @@ async def create_session(session_input: SessionCreateInput):
             session_input.headless,
             session_input.viewport_width,
             session_input.viewport_height,
-            session_input.record_video
+            session_input.record_video,
+            session_input.timeout,
+            session_input.block_resources
         )
         
         return {
             "status": "success",
             "session_id": session_id,
             "timeout": session_input.timeout,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
@@ -750,27 +1266,13 @@ async def list_active_sessions():
     }
     ```
     """
-    active_sessions = []
-    
-    for session_id, session_data in session_manager.sessions.items():
-        metadata = session_data["metadata"]
-        active_sessions.append({
-            "session_id": session_id,
-            "created_at": metadata["created_at"],
-            "browser_type": metadata["browser_type"],
-            "headless": metadata["headless"],
-            "record_video": metadata.get("record_video", False),
-            "status": metadata["status"],
-            "total_actions": metadata["total_actions"],
-            "last_activity": metadata["last_activity"],
-            "viewport": metadata["viewport"]
-        })
+    active_sessions = session_manager.list_sessions()
     
     return {
         "status": "success",
         "active_sessions": active_sessions,
         "total_sessions": len(active_sessions),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }
 
 @app.get("/api/sessions/{session_id}/status")
@@ -784,8 +1286,8 @@ async def get_session_status(session_id: str):
         "status": "active",
         "session_id": session_id,
         "created_at": session["created_at"],
-        "screenshots_count": len(session["screenshots"]),
-        "timestamp": datetime.now().isoformat()
+        "screenshots_count": len(session["metadata"]["screenshots"]),
+        "timestamp": now_iso()
     }
 
 @app.delete("/api/sessions/{session_id}")
@@ -800,9 +1302,52 @@ async def close_session(session_id: str):
         "status": "success",
         "message": "Session closed",
         "session_id": session_id,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }
 
+async def _run_sequence_action(page, action: SequenceAction, step: int, session_id: str, screenshots: List[str], pending_writes: List[asyncio.Task]) -> ActionResult:
+    """Execute a single sequence action, taking its screenshot_after capture if requested"""
+    result = ActionResult(action.action, step)
+    
+    if action.block_resources is not None:
+        await session_manager.set_resource_blocking(session_id, action.block_resources)
+    
+    if action.action == "goto":
+        await page.goto(action.url, timeout=action.timeout, wait_until=action.wait_until or "domcontentloaded")
+        result.url = action.url
+        result.status = "success"
+    
+    elif action.action == "click":
+        await page.click(action.selector, timeout=action.timeout)
+        result.selector = action.selector
+        result.status = "success"
+    
+    elif action.action == "type":
+        await page.fill(action.selector, action.text)
+        result.selector = action.selector
+        result.text = action.text
+        result.status = "success"
+    
+    elif action.action == "wait":
+        await page.wait_for_timeout(action.timeout)
+        result.timeout = action.timeout
+        result.status = "success"
+    
+    else:
+        result.status = "error"
+        result.message = f"Unknown action: {action.action}"
+    
+    # Take screenshot after action if requested
+    if action.screenshot_after:
+        options, extension = screenshot_options(action.screenshot_format, action.screenshot_quality)
+        screenshot_path = str(SCREENSHOTS_BASE / f"session_{session_id}_step_{step}.{extension}")
+        # Write in the background so the next action doesn't wait on the disk
+        await capture_screenshot_deferred(page, screenshot_path, pending_writes, **options)
+        screenshots.append(screenshot_path)
+        result.screenshot_path = screenshot_path
+    
+    return result
+
 @app.post("/api/sessions/{session_id}/sequence")
 async def execute_sequence(session_id: str, sequence_input: SequenceInput):
     """
@@ -812,6 +1357,7 @@ async def execute_sequence(session_id: str, sequence_input: SequenceInput):
     - Executes actions sequentially on persistent browser session
     - Takes screenshots after actions when `screenshot_after: true`
     - Pauses execution on `wait_for_screenshot_analysis` for human review
+    - Runs consecutive actions with the same `parallel_group` concurrently, each in its own tab
     - Maintains session state between API calls
     
     **Example:**
@@ -841,93 +1387,94 @@ async def execute_sequence(session_id: str, sequence_input: SequenceInput):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    actions = sequence_input.actions
+    if any(a.parallel_group is not None and a.action == "wait_for_screenshot_analysis" for a in actions):
+        raise HTTPException(status_code=400, detail="wait_for_screenshot_analysis cannot be part of a parallel group")
+    
     page = session["page"]
-    recordings_dir = "/opt/code-server/recordings"
     action_results = []
     screenshots = []
+    pending_writes = []
     
     try:
-        for i, action in enumerate(sequence_input.actions):
-            result = {"action": action.action, "step": i}
-            
-            if action.action == "goto":
-                await page.goto(action.url, timeout=action.timeout)
-                result["url"] = action.url
-                result["status"] = "success"
-            
-            elif action.action == "click":
-                await page.click(action.selector, timeout=action.timeout)
-                result["selector"] = action.selector
-                result["status"] = "success"
-            
-            elif action.action == "type":
-                await page.fill(action.selector, action.text)
-                result["selector"] = action.selector
-                result["text"] = action.text
-                result["status"] = "success"
-            
-            elif action.action == "wait":
-                await page.wait_for_timeout(action.timeout)
-                result["timeout"] = action.timeout
-                result["status"] = "success"
+        i = 0
+        while i < len(actions):
+            action = actions[i]
             
-            elif action.action == "wait_for_screenshot_analysis":
+            if action.action == "wait_for_screenshot_analysis":
                 # This pauses execution and returns current state for analysis
-                screenshot_path = f"{recordings_dir}/screenshots/session_{session_id}_analysis_{i}.png"
-                await page.screenshot(path=screenshot_path)
+                result = ActionResult(action.action, i)
+                screenshot_path = str(SCREENSHOTS_BASE / f"session_{session_id}_analysis_{i}.png")
+                await capture_screenshot_deferred(page, screenshot_path, pending_writes, type="png")
                 screenshots.append(screenshot_path)
-                session["screenshots"].append(screenshot_path)
                 
-                result["status"] = "waiting_for_analysis"
-                result["screenshot_path"] = screenshot_path
-                result["message"] = "Execution paused - analyze screenshot and continue with next API call"
+                result.status = "waiting_for_analysis"
+                result.screenshot_path = screenshot_path
+                result.message = "Execution paused - analyze screenshot and continue with next API call"
                 action_results.append(result)
                 
+                # Every returned screenshot path must exist on disk before the client sees it
+                await asyncio.gather(*pending_writes)
                 return {
                     "status": "paused_for_analysis",
                     "session_id": session_id,
                     "current_step": i,
                     "screenshot_for_analysis": screenshot_path,
-                    "next_actions": sequence_input.actions[i+1:],
-                    "completed_actions": action_results,
+                    "next_actions": actions[i+1:],
+                    "completed_actions": [r.to_dict() for r in action_results],
                     "message": "Review screenshot and call /api/sessions/{session_id}/continue to proceed"
                 }
             
-            else:
-                result["status"] = "error"
-                result["message"] = f"Unknown action: {action.action}"
+            # Collect the run of consecutive actions sharing this action's parallel group
+            group_end = i + 1
+            if action.parallel_group is not None:
+                while group_end < len(actions) and actions[group_end].parallel_group == action.parallel_group:
+                    group_end += 1
             
-            # Take screenshot after action if requested
-            if action.screenshot_after:
-                screenshot_path = f"{recordings_dir}/screenshots/session_{session_id}_step_{i}.png"
-                await page.screenshot(path=screenshot_path)
-                screenshots.append(screenshot_path)
-                session["screenshots"].append(screenshot_path)
-                result["screenshot_path"] = screenshot_path
+            if group_end - i == 1:
+                action_results.append(await _run_sequence_action(page, action, i, session_id, screenshots, pending_writes))
+            else:
+                # One tab per slot so concurrent navigation and input never race on the same page
+                pages = await session_manager.get_parallel_pages(session_id, group_end - i)
+                # Let every slot finish before handling a failure, so no tab is still navigating or
+                # queueing screenshot writes when the error path runs
+                outcomes = await asyncio.gather(*[
+                    _run_sequence_action(pages[slot], actions[i + slot], i + slot, session_id, screenshots, pending_writes)
+                    for slot in range(group_end - i)
+                ], return_exceptions=True)
+                action_results.extend(r for r in outcomes if isinstance(r, ActionResult))
+                for outcome in outcomes:
+                    if isinstance(outcome, BaseException):
+                        raise outcome
             
-            action_results.append(result)
+            i = group_end
         
+        await asyncio.gather(*pending_writes)
         return {
             "status": "completed",
             "session_id": session_id,
             "actions_executed": len(action_results),
-            "action_results": action_results,
+            "action_results": [r.to_dict() for r in action_results],
             "screenshots": screenshots,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     
     except Exception as e:
+        # Let screenshots of the completed actions finish writing
+        await asyncio.gather(*pending_writes, return_exceptions=True)
+        
         # Take error screenshot
-        error_screenshot = f"{recordings_dir}/screenshots/session_{session_id}_error.png"
-        await page.screenshot(path=error_screenshot)
+        error_screenshot = await capture_error_screenshot(
+            page, str(SCREENSHOTS_BASE / f"session_{session_id}_error.{SCREENSHOT_EXTENSION}")
+        )
         
         return {
             "status": "error",
             "session_id": session_id,
             "error": str(e),
             "error_screenshot": error_screenshot,
-            "completed_actions": action_results,
-            "timestamp": datetime.now().isoformat()
+            "completed_actions": [r.to_dict() for r in action_results],
+            "timestamp": now_iso()
         }
 
 @app.post("/api/sessions/{session_id}/screenshot")
@@ -951,8 +1498,8 @@ async def take_screenshot(session_id: str, include_base64: bool = False):
     ```json
     {
       "status": "success",
-      "screenshot_path": "/opt/code-server/recordings/screenshots/session_abc12345_1694123456.png",
-      "screenshot_base64": "iVBORw0KGgoAAAANSUhEUgAA...",
+      "screenshot_path": "/opt/code-server/recordings/sessions/session_abc12345/screenshots/001_manual_screenshot.jpg",
+      "screenshot_base64": "/9j/4AAQSkZJRgABAQAAAQ...",
       "screenshot_size": 25432
     }
     ```
@@ -966,24 +1513,258 @@ async def take_screenshot(session_id: str, include_base64: bool = False):
     # Use SessionManager to create properly named screenshot
     screenshot_path = session_manager.add_screenshot(session_id, "manual", "screenshot")
     
-    await page.screenshot(path=screenshot_path)
+    screenshot_bytes = await capture_screenshot(page, screenshot_path, **SCREENSHOT_OPTIONS)
     
     response = {
         "status": "success",
         "session_id": session_id,
         "screenshot_path": screenshot_path,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }
     
     if include_base64:
-        import base64
-        with open(screenshot_path, "rb") as f:
-            screenshot_bytes = f.read()
-            response["screenshot_base64"] = base64.b64encode(screenshot_bytes).decode('utf-8')
-            response["screenshot_size"] = len(screenshot_bytes)
+        # Encode from the captured buffer rather than reading the file back
+        response["screenshot_base64"] = pybase64.b64encode(screenshot_bytes).decode('ascii')
+        response["screenshot_size"] = len(screenshot_bytes)
     
     return response
 
+@app.get(
+    "/api/sessions/{session_id}/screenshot/raw",
+    response_class=Response,
+    responses={200: {"content": {"image/jpeg": {}, "image/png": {}}, "description": "Screenshot image bytes"}}
+)
+async def take_raw_screenshot(session_id: str):
+    """
+    Capture the current page and return the image bytes directly, without base64 or saving to disk
+    
+    **Example:**
+    ```bash
+    curl -o page.jpg http://100.95.89.72:8000/api/sessions/abc12345/screenshot/raw
+    ```
+    """
+    session = await session_manager.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    image_bytes = await session["page"].screenshot(**SCREENSHOT_OPTIONS)
+    return Response(
+        content=image_bytes,
+        media_type=f"image/{SCREENSHOT_OPTIONS['type']}",
+        headers={"Cache-Control": "no-store"}
+    )
+
+anthropic_client = anthropic.AsyncAnthropic()
+
+# Extract the action array from a fenced ```json block, or failing that from the raw reply
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+_JSON_ARRAY_RE = re.compile(r'(\[.*?\])', re.DOTALL)
+
+# Static instructions for /natural. Kept identical across requests and above the minimum
+# cacheable length so the API serves it from the prompt cache; only the instruction varies.
+NL_SYSTEM_PROMPT = """You convert natural language browser instructions into a JSON array of Playwright actions.
+The user message is the instruction. Return ONLY a valid JSON array of action objects, with no prose
+before or after it. The actions are executed in order on a single persistent browser page that may
+already be showing a site from earlier instructions in the same session.
+
+Available actions:
+
+- {"action": "goto", "url": "https://example.com"}
+  Navigate the page to an absolute URL. Always include the scheme (https:// unless the user asks for
+  http://). Optional "timeout" in milliseconds (default 30000). A screenshot is taken automatically
+  after navigation.
+
+- {"action": "click", "selector": "button.submit"}
+  Click the first element matching a CSS or Playwright selector. Optional "timeout" in milliseconds
+  (default 5000). Prefer stable selectors: ids, name attributes, aria labels, data-testid attributes,
+  or Playwright text selectors such as text=Sign in. Avoid long positional chains like div > div > a.
+  A screenshot is taken automatically after the click.
+
+- {"action": "type", "selector": "input[name='q']", "text": "search term"}
+  Fill a text input or textarea matching the selector with the given text, replacing its current
+  value. Clicking the field first is not required. A screenshot is taken automatically afterwards.
+
+- {"action": "wait", "timeout": 3000}
+  Pause for the given number of milliseconds. Use short waits (1000-3000) only when the instruction
+  implies waiting for something to load or animate, such as search results or a modal.
+
+- {"action": "screenshot"}
+  Capture the current state of the page. Use it when the user asks to see, capture, check or
+  show something, or at the end of a multi-step task whose final state matters.
+
+Rules:
+1. Output must be a JSON array even for a single action.
+2. Use only the five actions above and only the fields shown for each. Never invent new actions
+   such as "press", "scroll", "select" or "hover".
+3. Every "click" and "type" action needs a "selector". Every "goto" needs a "url". Every "type"
+   needs "text".
+4. To submit a search or form, click the submit button rather than relying on the Enter key.
+5. If the instruction names a website without a URL, use its canonical homepage, for example
+   https://www.google.com, https://github.com or https://en.wikipedia.org.
+6. If the instruction refers to the current page ("click the login button", "fill in the email"),
+   do not add a goto action.
+7. Keep the sequence minimal. Do not add waits or screenshots the instruction does not call for,
+   except a short wait after submitting a search or form when the next step depends on the results.
+8. Never include comments, trailing commas or markdown fences.
+
+Examples:
+
+Instruction: Go to google.com and search for playwright automation
+[
+  {"action": "goto", "url": "https://google.com"},
+  {"action": "click", "selector": "input[name='q']"},
+  {"action": "type", "selector": "input[name='q']", "text": "playwright automation"},
+  {"action": "click", "selector": "input[value='Google Search']"}
+]
+
+Instruction: Open the Wikipedia article on the Eiffel Tower and take a screenshot
+[
+  {"action": "goto", "url": "https://en.wikipedia.org/wiki/Eiffel_Tower"},
+  {"action": "screenshot"}
+]
+
+Instruction: Log in with username demo and password secret
+[
+  {"action": "type", "selector": "input[name='username']", "text": "demo"},
+  {"action": "type", "selector": "input[name='password']", "text": "secret"},
+  {"action": "click", "selector": "button[type='submit']"},
+  {"action": "wait", "timeout": 2000},
+  {"action": "screenshot"}
+]
+
+Instruction: Fill the httpbin form with customer name John Doe and telephone 555-0100
+[
+  {"action": "goto", "url": "https://httpbin.org/forms/post"},
+  {"action": "type", "selector": "input[name='custname']", "text": "John Doe"},
+  {"action": "type", "selector": "input[name='custtel']", "text": "555-0100"}
+]
+
+Instruction: Search GitHub for fastapi and open the first repository
+[
+  {"action": "goto", "url": "https://github.com/search?q=fastapi&type=repositories"},
+  {"action": "wait", "timeout": 2000},
+  {"action": "click", "selector": "[data-testid='results-list'] a"},
+  {"action": "screenshot"}
+]
+
+Instruction: Wait a few seconds and show me the page
+[
+  {"action": "wait", "timeout": 3000},
+  {"action": "screenshot"}
+]"""
+
+# Generated actions are cached by instruction so repeats skip the model call
+NL_CACHE_SIZE = 1024
+NL_CACHE_DB = os.getenv("NL_CACHE_DB", str(RECORDINGS_BASE / "nl_cache.sqlite3"))
+
+class ActionCache:
+    """LRU of generated action lists keyed by instruction hash, persisted to SQLite across restarts"""
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.size = size
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._db_ready = False
+        # The model and system prompt are part of every key, so changing either invalidates old entries
+        self._key_prefix = hashlib.sha256(f"{NL_MODEL}\0{NL_SYSTEM_PROMPT}\0".encode())
+    
+    def key(self, instruction: str) -> str:
+        h = self._key_prefix.copy()
+        h.update(instruction.encode())
+        return h.hexdigest()
+    
+    def _db(self, statement: str, params: tuple = ()):
+        if not self._db_ready:
+            # Nothing else creates the recordings tree before the first natural-language request
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            if not self._db_ready:
+                conn.execute("CREATE TABLE IF NOT EXISTS nl_cache (key TEXT PRIMARY KEY, actions BLOB NOT NULL)")
+                self._db_ready = True
+            return conn.execute(statement, params).fetchone()
+    
+    def _remember(self, key: str, actions: list):
+        self._entries[key] = actions
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+    
+    async def get(self, key: str) -> Optional[list]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if not self.db_path:
+            return None
+        try:
+            row = await asyncio.to_thread(self._db, "SELECT actions FROM nl_cache WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError):
+            return None  # An unreadable cache database only costs a model call
+        if row is None:
+            return None
+        actions = orjson.loads(row[0])
+        self._remember(key, actions)
+        return actions
+    
+    async def put(self, key: str, actions: list):
+        self._remember(key, actions)
+        if self.db_path:
+            try:
+                await asyncio.to_thread(self._db, "INSERT OR REPLACE INTO nl_cache (key, actions) VALUES (?, ?)", (key, orjson.dumps(actions)))
+            except (sqlite3.Error, OSError):
+                pass  # Still cached in memory for this process
+    
+    async def clear(self) -> tuple:
+        """Drop every entry, returning the in-memory count and whether the database was cleared too"""
+        cleared = len(self._entries)
+        self._entries.clear()
+        if not self.db_path:
+            return cleared, False
+        try:
+            await asyncio.to_thread(self._db, "DELETE FROM nl_cache")
+        except (sqlite3.Error, OSError):
+            return cleared, False
+        return cleared, True
+
+nl_cache = ActionCache(NL_CACHE_DB, NL_CACHE_SIZE)
+
+async def _generate_actions(instruction: str) -> list:
+    """Ask the model to convert an instruction into a list of action dicts"""
+    # The system prompt is served from the prompt cache; only the instruction is new input
+    try:
+        response = await asyncio.wait_for(
+            anthropic_client.messages.create(
+                model=NL_MODEL,
+                max_tokens=1024,
+                system=[{"type": "text", "text": NL_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+                messages=[{"role": "user", "content": instruction}]
+            ),
+            timeout=NL_TIMEOUT
+        )
+    except anthropic.APIError as e:
+        raise HTTPException(status_code=500, detail=f"Claude request failed: {str(e)}")
+    
+    # Parse Claude's JSON response
+    try:
+        # Extract JSON from markdown code blocks if present
+        claude_output = response.content[0].text.strip()
+        
+        # Look for JSON in ```json blocks
+        json_match = _JSON_FENCE_RE.search(claude_output)
+        if json_match:
+            json_text = json_match.group(1)
+        else:
+            # Try to find JSON array directly
+            json_match = _JSON_ARRAY_RE.search(claude_output)
+            if json_match:
+                json_text = json_match.group(1)
+            else:
+                json_text = claude_output
+        
+        generated_actions = orjson.loads(json_text)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to parse Claude response as JSON: {str(e)}\nResponse: {claude_output}")
+    
+    return generated_actions
+
 @app.post("/api/sessions/{session_id}/natural")
 async def execute_natural_language(session_id: str, nl_input: NaturalLanguageInput):
     """
@@ -999,12 +1780,16 @@ async def execute_natural_language(session_id: str, nl_input: NaturalLanguageInp
       }'
     ```
     
+    Actions generated for an instruction are cached and replayed for identical instructions;
+    send `"no_cache": true` to regenerate them.
+    
     **Response:**
     ```json
     {
       "status": "completed",
       "instruction": "Go to google.com and search for playwright automation",
       "generated_actions": [...],
+      "cache_hit": false,
       "action_results": [...],
       "screenshot_path": "..."
     }
@@ -1014,64 +1799,14 @@ async def execute_natural_language(session_id: str, nl_input: NaturalLanguageInp
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    pending_writes = []
+    
     try:
-        # Create prompt template for Claude
-        prompt_template = f"""Convert this natural language browser instruction into a JSON array of Playwright actions.
-
-USER INSTRUCTION: "{nl_input.instruction}"
-
-Return ONLY a valid JSON array with actions. Available actions:
-- {{"action": "goto", "url": "https://example.com"}}
-- {{"action": "click", "selector": "button.submit"}}  
-- {{"action": "type", "selector": "input[name='q']", "text": "search term"}}
-- {{"action": "wait", "timeout": 3000}}
-- {{"action": "screenshot"}}
-
-Example output:
-[
-  {{"action": "goto", "url": "https://google.com"}},
-  {{"action": "click", "selector": "input[name='q']"}},
-  {{"action": "type", "selector": "input[name='q']", "text": "playwright automation"}},
-  {{"action": "click", "selector": "input[value='Google Search']"}}
-]
-
-JSON array:"""
-
-        # Execute Claude command to convert natural language
-        claude_command = ["claude", "-p", prompt_template]
-        result = subprocess.run(
-            claude_command,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            cwd="/root"
-        )
-        
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"Claude command failed: {result.stderr}")
-        
-        # Parse Claude's JSON response
-        import json
-        import re
-        try:
-            # Extract JSON from markdown code blocks if present
-            claude_output = result.stdout.strip()
-            
-            # Look for JSON in ```json blocks
-            json_match = re.search(r'```(?:json)?\s*(\[.*?\])\s*```', claude_output, re.DOTALL)
-            if json_match:
-                json_text = json_match.group(1)
-            else:
-                # Try to find JSON array directly
-                json_match = re.search(r'(\[.*?\])', claude_output, re.DOTALL)
-                if json_match:
-                    json_text = json_match.group(1)
-                else:
-                    json_text = claude_output
-            
-            generated_actions = json.loads(json_text)
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=500, detail=f"Failed to parse Claude response as JSON: {str(e)}\nResponse: {result.stdout}")
+        cache_key = nl_cache.key(nl_input.instruction)
+        generated_actions = None if nl_input.no_cache else await nl_cache.get(cache_key)
+        cache_hit = generated_actions is not None
+        if not cache_hit:
+            generated_actions = await _generate_actions(nl_input.instruction)
         
         # Convert to SequenceAction objects and execute
         page = session["page"]
@@ -1079,79 +1814,94 @@ JSON array:"""
         screenshot_path = None
         
         for i, action_data in enumerate(generated_actions):
-            result_item = {"action": action_data.get("action"), "step": i}
+            result_item = ActionResult(action_data.get("action"), i)
+            selector = action_data.get("selector")
+            safe_sel = selector.replace(' ', '_') if selector else None
             
             if action_data["action"] == "goto":
                 await page.goto(action_data["url"], timeout=action_data.get("timeout", 30000))
-                result_item["url"] = action_data["url"]
-                result_item["status"] = "success"
+                result_item.url = action_data["url"]
+                result_item.status = "success"
                 
                 # Auto-screenshot after navigation
                 screenshot_path = session_manager.add_screenshot(session_id, "goto", f"navigate_to_{action_data['url'].replace('https://', '').replace('http://', '').replace('/', '_')}", action_data["url"])
-                await page.screenshot(path=screenshot_path)
-                result_item["screenshot_path"] = screenshot_path
+                await capture_screenshot_deferred(page, screenshot_path, pending_writes, **SCREENSHOT_OPTIONS)
+                result_item.screenshot_path = screenshot_path
             
             elif action_data["action"] == "click":
-                await page.click(action_data["selector"], timeout=action_data.get("timeout", 5000))
-                result_item["selector"] = action_data["selector"]
-                result_item["status"] = "success"
+                await page.click(selector, timeout=action_data.get("timeout", 5000))
+                result_item.selector = selector
+                result_item.status = "success"
                 
                 # Auto-screenshot after click
-                screenshot_path = session_manager.add_screenshot(session_id, "click", f"clicked_{action_data['selector'].replace(' ', '_')}")
-                await page.screenshot(path=screenshot_path)
-                result_item["screenshot_path"] = screenshot_path
+                screenshot_path = session_manager.add_screenshot(session_id, "click", f"clicked_{safe_sel}")
+                await capture_screenshot_deferred(page, screenshot_path, pending_writes, **SCREENSHOT_OPTIONS)
+                result_item.screenshot_path = screenshot_path
             
             elif action_data["action"] == "type":
-                await page.fill(action_data["selector"], action_data["text"])
-                result_item["selector"] = action_data["selector"]
-                result_item["text"] = action_data["text"]
-                result_item["status"] = "success"
+                await page.fill(selector, action_data["text"])
+                result_item.selector = selector
+                result_item.text = action_data["text"]
+                result_item.status = "success"
                 
                 # Auto-screenshot after typing
-                screenshot_path = session_manager.add_screenshot(session_id, "type", f"typed_in_{action_data['selector'].replace(' ', '_')}")
-                await page.screenshot(path=screenshot_path)
-                result_item["screenshot_path"] = screenshot_path
+                screenshot_path = session_manager.add_screenshot(session_id, "type", f"typed_in_{safe_sel}")
+                await capture_screenshot_deferred(page, screenshot_path, pending_writes, **SCREENSHOT_OPTIONS)
+                result_item.screenshot_path = screenshot_path
             
             elif action_data["action"] == "wait":
                 await page.wait_for_timeout(action_data.get("timeout", 3000))
-                result_item["timeout"] = action_data.get("timeout", 3000)
-                result_item["status"] = "success"
+                result_item.timeout = action_data.get("timeout", 3000)
+                result_item.status = "success"
                 
             elif action_data["action"] == "screenshot":
                 screenshot_path = session_manager.add_screenshot(session_id, "screenshot", "manual_screenshot")
-                await page.screenshot(path=screenshot_path)
-                result_item["screenshot_path"] = screenshot_path
-                result_item["status"] = "success"
+                await capture_screenshot_deferred(page, screenshot_path, pending_writes, **SCREENSHOT_OPTIONS)
+                result_item.screenshot_path = screenshot_path
+                result_item.status = "success"
             
             else:
-                result_item["status"] = "error"
-                result_item["message"] = f"Unknown action: {action_data['action']}"
+                result_item.status = "error"
+                result_item.message = f"Unknown action: {action_data['action']}"
             
             action_results.append(result_item)
         
         # Take final screenshot if requested and no screenshot was taken
         if nl_input.include_screenshot and not screenshot_path:
             screenshot_path = session_manager.add_screenshot(session_id, "final", "completion_screenshot")
-            await page.screenshot(path=screenshot_path)
+            await capture_screenshot_deferred(page, screenshot_path, pending_writes, **SCREENSHOT_OPTIONS)
+        
+        # Every returned screenshot path must exist on disk before the client sees it
+        await asyncio.gather(*pending_writes)
+        
+        # Only a conversion that ran cleanly is worth replaying; unknown actions are reported as errors
+        if not cache_hit and all(r.status != "error" for r in action_results):
+            await nl_cache.put(cache_key, generated_actions)
         
         return {
             "status": "completed",
             "session_id": session_id,
             "instruction": nl_input.instruction,
             "generated_actions": generated_actions,
+            "cache_hit": cache_hit,
             "actions_executed": len(action_results),
-            "action_results": action_results,
+            "action_results": [r.to_dict() for r in action_results],
             "screenshot_path": screenshot_path,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=408, detail="Claude command timed out")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=408, detail="Claude request timed out")
     except Exception as e:
+        # Let screenshots of the completed actions finish writing
+        await asyncio.gather(*pending_writes, return_exceptions=True)
+        
         # Take error screenshot
         page = session["page"]
-        error_screenshot = session_manager.add_screenshot(session_id, "error", f"nl_error_{str(e)[:20].replace(' ', '_')}")
-        await page.screenshot(path=error_screenshot)
+        planned_path = session_manager.add_screenshot(session_id, "error", f"nl_error_{str(e)[:20].replace(' ', '_')}")
+        error_screenshot = await capture_error_screenshot(page, planned_path)
+        if planned_path and error_screenshot is None:
+            session_manager.discard_screenshot(session_id, planned_path)
         
         return {
             "status": "error", 
@@ -1159,11 +1909,50 @@ JSON array:"""
             "instruction": nl_input.instruction,
             "error": str(e),
             "error_screenshot": error_screenshot,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
 
+@app.post("/api/nl-cache/clear")
+async def clear_nl_cache():
+    """
+    Drop all cached natural-language conversions, in memory and on disk
+    
+    **Example:**
+    ```bash
+    curl -X POST http://100.95.89.72:8000/api/nl-cache/clear
+    ```
+    """
+    cleared, disk_cleared = await nl_cache.clear()
+    return {
+        "status": "success",
+        "cleared_in_memory": cleared,
+        "disk_cleared": disk_cleared,
+        "timestamp": now_iso()
+    }
+
+# Parsed metadata.json by path, reused while the file's mtime is unchanged
+METADATA_CACHE_SIZE = 512
+_metadata_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+async def _load_metadata(path) -> dict:
+    """Read a session's metadata.json, skipping the parse when its mtime hasn't changed"""
+    path = str(path)
+    st = await asyncio.to_thread(os.stat, path)
+    hit = _metadata_cache.get(path)
+    if hit and hit[0] == st.st_mtime:
+        _metadata_cache.move_to_end(path)
+        return hit[1]
+    
+    async with aiofiles.open(path, 'rb') as f:
+        data = orjson.loads(await f.read())
+    _metadata_cache[path] = (st.st_mtime, data)
+    _metadata_cache.move_to_end(path)
+    if len(_metadata_cache) > METADATA_CACHE_SIZE:
+        _metadata_cache.popitem(last=False)
+    return data
+
 @app.get("/api/sessions/{session_id}/assets")
-async def get_session_assets(session_id: str):
+async def get_session_assets(session_id: str, request: Request, response: Response):
     """
     Get all assets (screenshots, videos, traces) for a session
     
@@ -1187,21 +1976,29 @@ async def get_session_assets(session_id: str):
       }
     }
     ```
+    
+    Responses carry an `ETag`; send it back in `If-None-Match` to get `304 Not Modified` while nothing changed.
     """
     session = await session_manager.get_session(session_id)
     if not session:
         # Try to load from disk if session not in memory
-        session_dir = f"/opt/code-server/recordings/sessions/session_{session_id}"
-        metadata_path = f"{session_dir}/metadata.json"
+        metadata_path = SESSIONS_BASE / f"session_{session_id}" / "metadata.json"
         
-        if not os.path.exists(metadata_path):
+        try:
+            metadata = await _load_metadata(metadata_path)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Session not found")
-        
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
     else:
         metadata = session["metadata"]
     
+    # Every metadata change refreshes last_activity; the counts also change when a failed capture's entry is dropped
+    fingerprint = (f'{metadata["last_activity"]}|{metadata["status"]}|{len(metadata["screenshots"])}'
+                   f'|{len(metadata["videos"])}|{len(metadata["traces"])}')
+    etag = f'"{hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()}"'
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
     return {
         "session_id": session_id,
         "status": metadata["status"],
@@ -1217,7 +2014,7 @@ async def get_session_assets(session_id: str):
             "traces": metadata["traces"]
         },
         "session_dir": metadata["session_dir"],
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }
 
 @app.delete("/api/sessions/{session_id}/cleanup")
@@ -1230,24 +2027,66 @@ async def cleanup_session(session_id: str):
     curl -X DELETE http://100.95.89.72:8000/api/sessions/abc12345/cleanup
     ```
     """
-    import shutil
-    
     # Close active session if running
     if session_id in session_manager.sessions:
         await session_manager.close_session(session_id)
     
     # Remove session directory
-    session_dir = f"/opt/code-server/recordings/sessions/session_{session_id}"
-    if os.path.exists(session_dir):
-        shutil.rmtree(session_dir)
-        return {
-            "status": "success",
-            "message": f"Session {session_id} cleaned up",
-            "session_id": session_id,
-            "timestamp": datetime.now().isoformat()
-        }
-    else:
+    session_dir = SESSIONS_BASE / f"session_{session_id}"
+    try:
+        await asyncio.to_thread(shutil.rmtree, session_dir)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Session directory not found")
+    
+    return {
+        "status": "success",
+        "message": f"Session {session_id} cleaned up",
+        "session_id": session_id,
+        "timestamp": now_iso()
+    }
+
+def _scan_stale_sessions(sessions_dir: Path, cutoff: float) -> List[str]:
+    """Return session directories whose metadata.json was last written before cutoff"""
+    stale = []
+    with os.scandir(sessions_dir) as it:
+        for entry in it:
+            if not entry.name.startswith("session_") or not entry.is_dir(follow_symlinks=False):
+                continue
+            # metadata.json is rewritten on every flush, so a recent mtime means a recently active session
+            try:
+                if os.stat(os.path.join(entry.path, "metadata.json")).st_mtime < cutoff:
+                    stale.append(entry.path)
+            except FileNotFoundError:
+                continue
+    return stale
+
+async def _maybe_archive(session_path: str, current_time: float, max_age_seconds: int) -> Optional[dict]:
+    """Archive one session directory if its last activity is older than max_age_seconds"""
+    try:
+        metadata = await _load_metadata(f"{session_path}/metadata.json")
+    except FileNotFoundError:
+        return None
+    
+    # Parse last activity timestamp
+    last_activity = datetime.fromisoformat(metadata["last_activity"]).timestamp()
+    if current_time - last_activity <= max_age_seconds:
+        return None
+    
+    session_id = metadata["session_id"]
+    
+    # Close if actively running
+    if session_id in session_manager.sessions:
+        await session_manager.close_session(session_id)
+    
+    # Move to archived folder
+    archived_dir = str(ARCHIVED_BASE / f"session_{session_id}_{int(last_activity)}")
+    await asyncio.to_thread(shutil.move, session_path, archived_dir)
+    
+    return {
+        "session_id": session_id,
+        "last_activity": metadata["last_activity"],
+        "archived_to": archived_dir
+    }
 
 @app.post("/api/sessions/cleanup-old")
 async def cleanup_old_sessions(max_age_hours: int = 24):
@@ -1259,56 +2098,42 @@ async def cleanup_old_sessions(max_age_hours: int = 24):
     curl -X POST "http://100.95.89.72:8000/api/sessions/cleanup-old?max_age_hours=24"
     ```
     """
-    import shutil
-    import glob
-    
-    sessions_dir = "/opt/code-server/recordings/sessions"
+    sessions_dir = SESSIONS_BASE
     if not os.path.exists(sessions_dir):
         return {"status": "success", "cleaned_sessions": [], "message": "No sessions directory found"}
     
     current_time = time.time()
     max_age_seconds = max_age_hours * 3600
-    cleaned_sessions = []
     
-    for session_path in glob.glob(f"{sessions_dir}/session_*"):
-        metadata_path = f"{session_path}/metadata.json"
-        
-        if os.path.exists(metadata_path):
-            try:
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                
-                # Parse last activity timestamp
-                last_activity = datetime.fromisoformat(metadata["last_activity"]).timestamp()
-                
-                if current_time - last_activity > max_age_seconds:
-                    session_id = metadata["session_id"]
-                    
-                    # Close if actively running
-                    if session_id in session_manager.sessions:
-                        await session_manager.close_session(session_id)
-                    
-                    # Move to archived folder
-                    archived_dir = f"/opt/code-server/recordings/archived/session_{session_id}_{int(last_activity)}"
-                    shutil.move(session_path, archived_dir)
-                    
-                    cleaned_sessions.append({
-                        "session_id": session_id,
-                        "last_activity": metadata["last_activity"],
-                        "archived_to": archived_dir
-                    })
-            
-            except Exception as e:
-                continue  # Skip problematic sessions
+    session_paths = await asyncio.to_thread(_scan_stale_sessions, sessions_dir, current_time - max_age_seconds)
+    await asyncio.to_thread(ARCHIVED_BASE.mkdir, parents=True, exist_ok=True)
+    results = await asyncio.gather(
+        *[_maybe_archive(p, current_time, max_age_seconds) for p in session_paths],
+        return_exceptions=True
+    )
+    # Skip sessions that are still fresh or couldn't be archived
+    cleaned_sessions = [r for r in results if isinstance(r, dict)]
     
     return {
         "status": "success",
         "max_age_hours": max_age_hours,
         "cleaned_sessions": cleaned_sessions,
         "total_cleaned": len(cleaned_sessions),
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }
 
+# Media formats that are already compressed are stored as-is in exports rather than deflated again
+PRECOMPRESSED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.mp4', '.webm', '.zip')
+
+def _list_session_files(session_dir: Path) -> List[tuple]:
+    """Return (file_path, arcname) pairs for every file under a session directory"""
+    files = []
+    for root, dirs, names in os.walk(session_dir):
+        for name in names:
+            file_path = os.path.join(root, name)
+            files.append((file_path, os.path.relpath(file_path, session_dir)))
+    return files
+
 @app.get("/api/sessions/{session_id}/export")
 async def export_session(session_id: str):
     """
@@ -1319,27 +2144,23 @@ async def export_session(session_id: str):
     curl -O http://100.95.89.72:8000/api/sessions/abc12345/export
     ```
     """
-    import zipfile
-    import tempfile
-    
-    session_dir = f"/opt/code-server/recordings/sessions/session_{session_id}"
+    session_dir = SESSIONS_BASE / f"session_{session_id}"
     if not os.path.exists(session_dir):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Create temporary zip file
-    temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix=f"_session_{session_id}.zip")
+    files = await asyncio.to_thread(_list_session_files, session_dir)
     
-    with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(session_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, session_dir)
-                zipf.write(file_path, arcname)
+    # Build the archive while it is sent instead of writing a temporary zip first
+    zs = ZipStream(compress_type=zipfile.ZIP_DEFLATED)
+    for file_path, arcname in files:
+        compress_type = zipfile.ZIP_STORED if file_path.lower().endswith(PRECOMPRESSED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+        zs.add_path(file_path, arcname, compress_type=compress_type)
     
-    return FileResponse(
-        temp_zip.name,
-        filename=f"session_{session_id}.zip",
-        media_type="application/zip"
+    # ZipStream is iterable but not an iterator, and StreamingResponse calls next() on sync bodies
+    return StreamingResponse(
+        iter(zs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="session_{session_id}.zip"'}
     )
 
 if __name__ == "__main__":
@@ -1348,14 +2169,28 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
     
-    print(f"Starting server on {host}:{port}")
-    print("Tailscale IP: 100.95.89.72")
-    print("Access via: http://100.95.89.72:8000")
+    # Sessions, the browser pool, and caches live in process memory, so each worker has its own;
+    # with WORKERS > 1 a session is only reachable through the worker that created it
+    workers = int(os.getenv("WORKERS", "1"))
+    uds = os.getenv("UDS")
+    
+    if uds:
+        print(f"Starting server on unix socket {uds}")
+    else:
+        print(f"Starting server on {host}:{port}")
+        print("Tailscale IP: 100.95.89.72")
+        print("Access via: http://100.95.89.72:8000")
+    if workers > 1:
+        print(f"Warning: running {workers} workers; browser sessions are not shared between them")
     
     uvicorn.run(
-        app,
+        "server:app",
         host=host,
         port=port,
+        uds=uds,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
         reload=False,
         log_level="info"
-    )
\ No newline at end of file
+    )